@@ -1,13 +1,17 @@
-import os, json, mimetypes
+import os, io, mimetypes, sqlite3, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
 from datetime import datetime
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, field
 
+import orjson
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from supabase import create_client
@@ -58,126 +62,322 @@ class InformeQC:
     secciones: list[Seccion]
     creado_en: str
 
+_SECCIONES_POR_DEFECTO: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("REVISIONES ELÉCTRICAS", (
+        "Consumo total (0.7A – 0.9A)",
+        "Revisión de cortocircuitos",
+        "Revisión visual de conexiones",
+        "Tensión de alimentación del procesador",
+    )),
+    ("REVISIONES DE SOFTWARE", (
+        "Conexión WiFi",
+        "Señal de Apagar con fuente de alimentación",
+        "Conexión Ethernet",
+        "Señal de Reinicio con fuente de alimentación",
+        "Configuración de fecha y hora",
+        "Lectura CAN",
+        "Configuración",
+        "Descarga de datos automática",
+    )),
+    ("REVISIONES DE HARDWARE", (
+        "Tornillos conector militar 19 pines",
+        "Temperatura (70 – 80 ºC)",
+        "Tornillos conector militar 6 pines",
+        "Revisión visual de la carcasa",
+        "Tornillos ventilador",
+        "Funcionamiento del ventilador",
+        "Tornillos disipador",
+        "Colocación de las baterías",
+        "Tornillos carcasa",
+        "Revisión de soldaduras",
+        "Tornillo placa relé",
+        "Revisión de cableado",
+    )),
+)
+
 def secciones_por_defecto() -> list[Seccion]:
-    return [
-        Seccion(
-            titulo="REVISIONES ELÉCTRICAS",
-            items=[
-                ChecklistItem("Consumo total (0.7A – 0.9A)"),
-                ChecklistItem("Revisión de cortocircuitos"),
-                ChecklistItem("Revisión visual de conexiones"),
-                ChecklistItem("Tensión de alimentación del procesador"),
-            ],
-        ),
-        Seccion(
-            titulo="REVISIONES DE SOFTWARE",
-            items=[
-                ChecklistItem("Conexión WiFi"),
-                ChecklistItem("Señal de Apagar con fuente de alimentación"),
-                ChecklistItem("Conexión Ethernet"),
-                ChecklistItem("Señal de Reinicio con fuente de alimentación"),
-                ChecklistItem("Configuración de fecha y hora"),
-                ChecklistItem("Lectura CAN"),
-                ChecklistItem("Configuración"),
-                ChecklistItem("Descarga de datos automática"),
-            ],
-        ),
-        Seccion(
-            titulo="REVISIONES DE HARDWARE",
-            items=[
-                ChecklistItem("Tornillos conector militar 19 pines"),
-                ChecklistItem("Temperatura (70 – 80 ºC)"),
-                ChecklistItem("Tornillos conector militar 6 pines"),
-                ChecklistItem("Revisión visual de la carcasa"),
-                ChecklistItem("Tornillos ventilador"),
-                ChecklistItem("Funcionamiento del ventilador"),
-                ChecklistItem("Tornillos disipador"),
-                ChecklistItem("Colocación de las baterías"),
-                ChecklistItem("Tornillos carcasa"),
-                ChecklistItem("Revisión de soldaduras"),
-                ChecklistItem("Tornillo placa relé"),
-                ChecklistItem("Revisión de cableado"),
-            ],
-        ),
-    ]
+    return [Seccion(titulo, [ChecklistItem(d) for d in descripciones]) for titulo, descripciones in _SECCIONES_POR_DEFECTO]
 
 def radio_estado(key: str) -> str:
-    return st.radio(key, ["", "OK", "NOK", "N/A"], index=0, horizontal=True, label_visibility="collapsed")
+    return st.radio(key, ["", "OK", "NOK", "N/A"], index=0, horizontal=True, key=key, label_visibility="collapsed")
 
-def construir_pdf(informe: InformeQC, destino_pdf: Path) -> None:
+# st.cache_resource y no lru_cache: Streamlit re-ejecuta app.py en cada rerun y
+# redefine la función, así que una lru_cache se perdería en cada interacción
+@st.cache_resource(show_spinner=False)
+def _estilos_pdf() -> tuple:
+    """Hoja de estilos y ``TableStyle`` compartidos por todos los PDF y sesiones."""
     estilos = getSampleStyleSheet()
-    doc = SimpleDocTemplate(str(destino_pdf), pagesize=A4, topMargin=24, leftMargin=24, rightMargin=24, bottomMargin=24)
-    contenido = []
-    contenido += [Paragraph(f"Informe de Control de Calidad — {informe.identificador}", estilos["Title"]), Spacer(1, 8)]
+    estilo_meta = TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),("BACKGROUND",(0,0),(-1,0),colors.whitesmoke),("VALIGN",(0,0),(-1,-1),"MIDDLE")])
+    estilo_seccion = TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),("BACKGROUND",(0,0),(-1,0),colors.lightgrey),("VALIGN",(0,0),(-1,-1),"TOP")])
+    return estilos, estilo_meta, estilo_seccion
+
+_MARGEN_PDF = 24
+_ANCHOS_META = (110, 180, 140, 120)
+_ANCHOS_SECCION = (260, 70, 220)
+_MARCO_A4 = (_MARGEN_PDF, _MARGEN_PDF, A4[0] - 2 * _MARGEN_PDF, A4[1] - 2 * _MARGEN_PDF)
+
+def _plantilla_pagina() -> PageTemplate:
+    # Frame guarda el estado de maquetación de cada build: uno nuevo por documento
+    return PageTemplate(id="pagina", frames=[Frame(*_MARCO_A4, id="normal")])
+
+def construir_pdf(informe: InformeQC, destino_pdf: Path | io.BytesIO, estilos_pdf: tuple | None = None) -> None:
+    estilos, estilo_meta, estilo_seccion = estilos_pdf or _estilos_pdf()
+    destino = destino_pdf if isinstance(destino_pdf, io.BytesIO) else str(destino_pdf)
+    doc = BaseDocTemplate(destino, pagesize=A4, pageTemplates=[_plantilla_pagina()])
+    flowables = [Paragraph(f"Informe de Control de Calidad — {informe.identificador}", estilos["Title"]), Spacer(1, 8)]
     meta = [
         ["N.º Identificador", informe.identificador, "Fecha de inspección", informe.fecha_inspeccion],
         ["Modelo", informe.modelo, "Fecha de fabricación", informe.fecha_fabricacion],
         ["Cliente", informe.cliente, "N.º de documento", informe.documento],
         ["Creado en", informe.creado_en, "", ""],
     ]
-    tmeta = Table(meta, colWidths=[110, 180, 140, 120])
-    tmeta.setStyle(TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),("BACKGROUND",(0,0),(-1,0),colors.whitesmoke),("VALIGN",(0,0),(-1,-1),"MIDDLE")]))
-    contenido += [tmeta, Spacer(1, 12)]
+    tmeta = Table(meta, colWidths=_ANCHOS_META)
+    tmeta.setStyle(estilo_meta)
+    flowables.extend((tmeta, Spacer(1, 12)))
+    # Una sola tabla para todas las secciones: una fila de título por sección
+    data = [["Descripción", "Estado", "Observación"]]
+    comandos = []
     for seccion in informe.secciones:
-        contenido.append(Paragraph(seccion.titulo, estilos["Heading2"]))
-        data = [["Descripción", "Estado", "Observación"]]
-        for it in seccion.items:
-            data.append([it.descripcion, it.estado or "-", it.observacion or "-"])
-        tabla = Table(data, colWidths=[260, 70, 220])
-        tabla.setStyle(TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),("BACKGROUND",(0,0),(-1,0),colors.lightgrey),("VALIGN",(0,0),(-1,-1),"TOP")]))
-        contenido += [tabla]
+        fila = len(data)
+        data.append([seccion.titulo, "", ""])
+        comandos += [
+            ("SPAN", (0, fila), (-1, fila)),
+            ("BACKGROUND", (0, fila), (-1, fila), colors.lightgrey),
+            ("FONTNAME", (0, fila), (-1, fila), "Helvetica-Bold"),
+        ]
+        data.extend((it.descripcion, it.estado or "-", it.observacion or "-") for it in seccion.items)
         if seccion.observacion_general.strip():
-            contenido += [Spacer(1, 6), Paragraph(f"Observaciones: {seccion.observacion_general}", estilos["Normal"])]
-        contenido.append(Spacer(1, 12))
-    doc.build(contenido)
+            fila = len(data)
+            data.append([Paragraph(f"Observaciones: {seccion.observacion_general}", estilos["Normal"]), "", ""])
+            comandos.append(("SPAN", (0, fila), (-1, fila)))
+    # splitInRow: una observación general larga puede partirse entre páginas
+    tabla = Table(data, colWidths=_ANCHOS_SECCION, repeatRows=1, splitInRow=1)
+    tabla.setStyle(estilo_seccion)
+    tabla.setStyle(comandos)
+    flowables.append(tabla)
+    doc.build(flowables)
+
+_CAMPOS_CABECERA = (
+    "identificador", "modelo", "cliente", "fecha_inspeccion", "fecha_fabricacion", "documento", "creado_en",
+)
+
+def _escribir_atomico(destino: Path, contenido: bytes) -> None:
+    """Escribe en un temporal y lo renombra: nunca queda un fichero a medias en ``destino``."""
+    tmp = destino.with_name(destino.name + ".tmp")
+    tmp.write_bytes(contenido)
+    os.replace(tmp, destino)
+
+def _informe_a_dict(inf: InformeQC) -> dict:
+    """Equivalente a ``asdict(inf)`` sin el recorrido genérico con deepcopy."""
+    return {
+        "identificador": inf.identificador,
+        "modelo": inf.modelo,
+        "cliente": inf.cliente,
+        "fecha_inspeccion": inf.fecha_inspeccion,
+        "fecha_fabricacion": inf.fecha_fabricacion,
+        "documento": inf.documento,
+        "secciones": [
+            {
+                "titulo": s.titulo,
+                "items": [{"descripcion": it.descripcion, "estado": it.estado, "observacion": it.observacion} for it in s.items],
+                "observacion_general": s.observacion_general,
+            }
+            for s in inf.secciones
+        ],
+        "creado_en": inf.creado_en,
+    }
 
-def guardar_informe(informe: InformeQC, base_dir: Path | None = None) -> tuple[Path, Path]:
+@st.cache_resource(show_spinner=False)
+def _pool_pdf() -> ThreadPoolExecutor:
+    """Hilos compartidos por todas las sesiones para generar PDF fuera del script."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf")
+
+def _generar_pdf(
+    informe: InformeQC, json_path: Path, pdf_path: Path, estilos_pdf: tuple, fila_indice: tuple | None,
+) -> tuple[bytes, str | None, str | None]:
+    """Genera el PDF, indexa el informe y lo sube a Supabase; se ejecuta en ``_pool_pdf``.
+
+    Todo lo que sigue al JSON ocurre aquí para que se complete aunque la sesión
+    cambie de página o se cierre antes de terminar.
+    """
+    buf = io.BytesIO()
+    construir_pdf(informe, buf, estilos_pdf)
+    pdf_bytes = buf.getvalue()
+    _escribir_atomico(pdf_path, pdf_bytes)
+    # El informe solo entra en el índice cuando su PDF ya existe
+    if fila_indice is not None:
+        with closing(_ensure_index_db()) as conn, conn:
+            conn.execute(_SQL_INDEXAR, fila_indice)
+
+    # Guardado local OK → ahora subimos a Supabase
+    remote_base = f"{informe.identificador}/"
+    json_url = upload_file_to_supabase(json_path, remote_base + json_path.name)
+    pdf_url = upload_file_to_supabase(pdf_path, remote_base + pdf_path.name)
+    _leer_informes_supabase.clear()
+    return pdf_bytes, json_url, pdf_url
+
+def guardar_informe(informe: InformeQC, base_dir: Path | None = None) -> tuple[Path, Path, Future]:
+    """Guarda el JSON y devuelve un ``Future`` con ``(pdf_bytes, json_url, pdf_url)``.
+
+    El PDF, el índice y la subida a Supabase se completan en segundo plano.
+    """
     base_root = Path(base_dir) if base_dir else REPORTS_DIR
     base = base_root / informe.identificador
     base.mkdir(parents=True, exist_ok=True)
     json_path = base / f"{informe.identificador}.json"
     pdf_path = base / f"{informe.identificador}.pdf"
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(asdict(informe), f, ensure_ascii=False, indent=2)
-    construir_pdf(informe, pdf_path)
-    return json_path, pdf_path
-
-def cargar_informes() -> pd.DataFrame:
-    rows = []
-    for jf in REPORTS_DIR.rglob("*.json"):
-        try:
-            with jf.open(encoding="utf-8") as f:
-                data = json.load(f)
-            rows.append({
-                "identificador": data.get("identificador",""),
-                "modelo": data.get("modelo",""),
-                "cliente": data.get("cliente",""),
-                "fecha_inspeccion": data.get("fecha_inspeccion",""),
-                "fecha_fabricacion": data.get("fecha_fabricacion",""),
-                "documento": data.get("documento",""),
-                "creado_en": data.get("creado_en",""),
-                "carpeta": str(Path(jf).parent),
-                "json": str(jf),
-                "pdf": str(Path(jf).with_suffix(".pdf")),
-            })
-        except Exception:
-            continue
-    df = pd.DataFrame(rows)
+    data = _informe_a_dict(informe)
+    _escribir_atomico(json_path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    # Solo REPORTS_DIR se lista desde el índice; otras carpetas no se tocan
+    fila = _fila_indice(data, json_path) if base_root.resolve() == REPORTS_DIR else None
+    # Los estilos se resuelven aquí: los hilos del pool no tienen contexto de Streamlit
+    pdf_future = _pool_pdf().submit(_generar_pdf, informe, json_path, pdf_path, _estilos_pdf(), fila)
+    return json_path, pdf_path, pdf_future
+
+def _con_texto_busqueda(df: pd.DataFrame) -> pd.DataFrame:
+    """Añade ``_haystack`` (identificador, cliente y modelo en minúsculas) para el buscador.
+
+    ``df.attrs["version"]`` identifica el listado cacheado y sobrevive a las copias de ``st.cache_data``.
+    """
     if not df.empty:
-        df = df.sort_values(by="creado_en", ascending=False)
+        # Sin fillna, un campo NA anularía el texto entero y la fila no se encontraría
+        campos = [df[c].fillna("") for c in ("identificador", "cliente", "modelo")]
+        df["_haystack"] = (campos[0] + "\x1f" + campos[1] + "\x1f" + campos[2]).str.lower()
+    df.attrs["version"] = time.time_ns()
     return df
 
-def ui_seccion(seccion: Seccion, key_prefix: str) -> Seccion:
+_MAX_MASCARAS = 16
+
+def _mascara_busqueda(df: pd.DataFrame, buscador: str) -> pd.Series:
+    """Máscara del buscador, memorizada por sesión (LRU) para no repetir el filtrado."""
+    cache = st.session_state.setdefault("mascaras_busqueda", OrderedDict())
+    clave = (df.attrs.get("version"), buscador)
+    mask = cache.get(clave)
+    if mask is None:
+        mask = df["_haystack"].str.contains(buscador.lower(), regex=False, na=False)
+        cache[clave] = mask
+        while len(cache) > _MAX_MASCARAS:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(clave)
+    return mask
+
+# En su propia carpeta: los ficheros de journal de SQLite no alteran el mtime de REPORTS_DIR
+_RUTA_INDICE = REPORTS_DIR / ".index" / "informes.sqlite"
+
+def clave_informes() -> tuple:
+    """Clave de caché para ``cargar_informes``: cambia al escribir en el índice o en REPORTS_DIR."""
+    return (
+        _RUTA_INDICE.stat().st_mtime_ns if _RUTA_INDICE.exists() else 0,
+        REPORTS_DIR.stat().st_mtime_ns,
+    )
+
+_COLUMNAS_INDICE = (
+    "identificador", "modelo", "cliente", "fecha_inspeccion", "fecha_fabricacion",
+    "documento", "creado_en", "carpeta", "json", "pdf", "mtime",
+)
+_SQL_INDEXAR = (
+    f"INSERT OR REPLACE INTO informes ({', '.join(_COLUMNAS_INDICE)}) "
+    f"VALUES ({', '.join('?' for _ in _COLUMNAS_INDICE)})"
+)
+
+def _fila_indice(data: dict, jf: Path) -> tuple:
+    """Fila del índice en el orden de ``_COLUMNAS_INDICE``."""
+    ruta = str(jf)
+    return (
+        *(data.get(k, "") for k in _CAMPOS_CABECERA),
+        os.path.dirname(ruta),
+        ruta,
+        ruta.removesuffix(".json") + ".pdf",
+        jf.stat().st_mtime_ns,
+    )
+
+def _leer_fila_indice(jf: Path) -> tuple | None:
+    try:
+        data = orjson.loads(jf.read_bytes())
+        # JSON válido pero que no es un informe (p. ej. una lista, o campos de cabecera anidados)
+        if not isinstance(data, dict):
+            return None
+        if not all(isinstance(data.get(k), (str, type(None))) for k in _CAMPOS_CABECERA):
+            return None
+        return _fila_indice(data, jf)
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+def _sincronizar_indice(conn: sqlite3.Connection) -> None:
+    """Reconcilia el índice con REPORTS_DIR: añade informes nuevos o modificados y quita los borrados."""
+    indexados = dict(conn.execute("SELECT json, mtime FROM informes"))
+    en_disco = {}
+    # Solo la estructura que escribe guardar_informe: <id>/<id>.json con su PDF al lado
+    for jf in REPORTS_DIR.glob("*/*.json"):
+        if jf.stem == jf.parent.name and jf.with_suffix(".pdf").exists():
+            try:
+                en_disco[str(jf)] = (jf, jf.stat().st_mtime_ns)
+            except OSError:
+                continue
+    # Solo se vuelven a leer los JSON que no están indexados con el mismo mtime
+    files = [jf for ruta, (jf, mtime) in en_disco.items() if indexados.get(ruta) != mtime]
+    # Lectura de muchos ficheros pequeños: dominada por la latencia de E/S
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        rows = [row for row in ex.map(_leer_fila_indice, files) if row is not None]
+    conn.executemany(_SQL_INDEXAR, rows)
+    conn.executemany("DELETE FROM informes WHERE json = ?", [(ruta,) for ruta in indexados if ruta not in en_disco])
+
+def _ensure_index_db() -> sqlite3.Connection:
+    """Abre (y crea si hace falta) el índice SQLite de informes de REPORTS_DIR."""
+    _RUTA_INDICE.parent.mkdir(exist_ok=True)
+    conn = sqlite3.connect(_RUTA_INDICE)
+    with conn:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS informes ("
+            "identificador TEXT NOT NULL, modelo TEXT, cliente TEXT, fecha_inspeccion TEXT, "
+            "fecha_fabricacion TEXT, documento TEXT, creado_en TEXT, carpeta TEXT, "
+            "json TEXT, pdf TEXT, mtime INTEGER)"
+        )
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS informes_identificador ON informes (identificador)")
+        conn.execute("CREATE TABLE IF NOT EXISTS estado (clave TEXT PRIMARY KEY, valor INTEGER)")
+    return conn
+
+@st.cache_data(show_spinner=False)
+def cargar_informes(dir_key: tuple) -> pd.DataFrame:
+    # El buscador filtra en pandas sobre ``_haystack``; aquí se lista todo
+    sql = f"SELECT {', '.join(_COLUMNAS_INDICE[:-1])} FROM informes ORDER BY creado_en DESC"
+    with closing(_ensure_index_db()) as conn:
+        # Se reconcilia con el disco cuando REPORTS_DIR cambia (informes copiados, movidos o borrados)
+        mtime_dir = REPORTS_DIR.stat().st_mtime_ns
+        fila = conn.execute("SELECT valor FROM estado WHERE clave = 'mtime_reports_dir'").fetchone()
+        if fila is None or fila[0] != mtime_dir:
+            with conn:
+                _sincronizar_indice(conn)
+                conn.execute("INSERT OR REPLACE INTO estado VALUES ('mtime_reports_dir', ?)", (mtime_dir,))
+        return _con_texto_busqueda(pd.read_sql_query(sql, conn, dtype="string[pyarrow]"))
+
+def ui_seccion(seccion: Seccion, key_prefix: str) -> None:
     st.subheader(seccion.titulo)
     for i, item in enumerate(seccion.items):
         c1, c2, c3 = st.columns([3,1,3])
         with c1: st.markdown(item.descripcion)
-        with c2: estado = radio_estado(f"{key_prefix}_estado_{i}")
-        with c3: obs = st.text_input(" ", key=f"{key_prefix}_obs_{i}", label_visibility="collapsed", placeholder="Observaciones")
-        seccion.items[i] = ChecklistItem(item.descripcion, estado, obs)
-    seccion.observacion_general = st.text_area("Observaciones generales", key=f"{key_prefix}_obs_general", placeholder="Incidencias y medidas a tomar")
+        with c2: radio_estado(f"{key_prefix}_estado_{i}")
+        with c3: st.text_input(" ", key=f"{key_prefix}_obs_{i}", label_visibility="collapsed", placeholder="Observaciones")
+    st.text_area("Observaciones generales", key=f"{key_prefix}_obs_general", placeholder="Incidencias y medidas a tomar")
     st.divider()
-    return seccion
+
+@st.fragment
+def _render_seccion(idx: int, seccion: Seccion) -> None:
+    # Los cambios en los widgets de una sección solo re-ejecutan esa sección
+    ui_seccion(seccion, f"sec{idx}")
+
+def leer_seccion(seccion: Seccion, key_prefix: str) -> Seccion:
+    """Construye la sección rellenada a partir de los widgets guardados en ``st.session_state``."""
+    estado = st.session_state
+    return Seccion(
+        titulo=seccion.titulo,
+        items=[
+            ChecklistItem(item.descripcion, estado.get(f"{key_prefix}_estado_{i}", ""), estado.get(f"{key_prefix}_obs_{i}", ""))
+            for i, item in enumerate(seccion.items)
+        ],
+        observacion_general=estado.get(f"{key_prefix}_obs_general", ""),
+    )
 
 def pagina_nuevo_informe():
     st.header("Nuevo informe")
@@ -196,7 +396,8 @@ def pagina_nuevo_informe():
     if "secciones" not in st.session_state:
         st.session_state.secciones = secciones_por_defecto()
 
-    secciones_actualizadas = [ui_seccion(sec, f"sec{i}") for i, sec in enumerate(st.session_state.secciones)]
+    for i, sec in enumerate(st.session_state.secciones):
+        _render_seccion(i, sec)
 
     preparar = st.button("Preparar guardado…", use_container_width=True, type="primary")
 
@@ -211,7 +412,7 @@ def pagina_nuevo_informe():
             fecha_inspeccion=fecha_inspeccion,
             fecha_fabricacion=fecha_fabricacion.strip(),
             documento=documento.strip(),
-            secciones=secciones_actualizadas,
+            secciones=[leer_seccion(sec, f"sec{i}") for i, sec in enumerate(st.session_state.secciones)],
             creado_en=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         )
         st.session_state.dir_guardado = str(REPORTS_DIR)
@@ -239,21 +440,8 @@ def pagina_nuevo_informe():
                 destino = Path(nueva_ruta).expanduser().resolve()
                 destino.mkdir(parents=True, exist_ok=True)
                 informe = st.session_state.informe_pendiente
-                json_path, pdf_path = guardar_informe(informe, base_dir=destino)
-
-                # Guardado local OK → ahora subimos a Supabase
-                remote_base = f"{informe.identificador}/"
-                json_url = upload_file_to_supabase(json_path, remote_base + json_path.name)
-                pdf_url = upload_file_to_supabase(pdf_path, remote_base + pdf_path.name)
-
-                with open(pdf_path, "rb") as f:
-                    st.success(f"Informe guardado en {pdf_path}")
-                    st.download_button("Descargar PDF", f.read(), file_name=pdf_path.name, use_container_width=True)
-
-                if pdf_url:
-                    st.link_button("Ver PDF en la nube (Supabase)", pdf_url, use_container_width=True)
-                if json_url:
-                    st.caption(f"Datos subidos a Supabase en {remote_base}")
+                json_path, pdf_path, pdf_future = guardar_informe(informe, base_dir=destino)
+                st.session_state.guardado_en_curso = (informe.identificador, pdf_path, pdf_future)
 
                 # Resetear estado
                 st.session_state.confirmar_guardado = False
@@ -262,63 +450,101 @@ def pagina_nuevo_informe():
                 st.error(f"No se pudo guardar el informe: {e}")
                 st.stop()
 
+    if st.session_state.get("guardado_en_curso"):
+        identificador, pdf_path, pdf_future = st.session_state.guardado_en_curso
+        if not pdf_future.done():
+            st.info("Generando PDF…")
+            time.sleep(0.5)
+            st.rerun()
+        st.session_state.guardado_en_curso = None
+        try:
+            pdf_bytes, json_url, pdf_url = pdf_future.result()
+            st.success(f"Informe guardado en {pdf_path}")
+            st.download_button("Descargar PDF", pdf_bytes, file_name=pdf_path.name, use_container_width=True)
+
+            if pdf_url:
+                st.link_button("Ver PDF en la nube (Supabase)", pdf_url, use_container_width=True)
+            if json_url:
+                st.caption(f"Datos subidos a Supabase en {identificador}/")
+        except Exception as e:
+            st.error(f"No se pudo guardar el informe: {e}")
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def _descargar_json(url: str) -> dict | None:
+    # La URL firmada cambia al refrescar el listado, lo que invalida la entrada
+    import requests
+    resp = requests.get(url)
+    if resp.status_code != 200:
+        return None
+    return orjson.loads(resp.content)
+
+# Ficheros locales: el mtime en la clave invalida la entrada si se sobrescribe el informe
+@st.cache_data(max_entries=256, show_spinner=False)
+def _leer_json_local(ruta: str, mtime_ns: int) -> dict:
+    return orjson.loads(Path(ruta).read_bytes())
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _leer_pdf_local(ruta: str, mtime_ns: int) -> bytes:
+    return Path(ruta).read_bytes()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _leer_informes_supabase() -> pd.DataFrame:
+    # TTL por debajo de la caducidad (3600 s) de las URLs firmadas
+    archivos = supabase.storage.from_(bucket).list("", limit=1000)
+    rows = []
+    for obj in archivos:
+        if obj["name"].endswith(".json"):
+            # URL firmada temporal para el JSON
+            json_url = supabase.storage.from_(bucket).create_signed_url(obj["name"], 3600)["signedURL"]
+
+            # Asumimos que el PDF está junto al JSON (mismo prefijo, distinta extensión)
+            pdf_name = obj["name"].replace(".json", ".pdf")
+            try:
+                pdf_url = supabase.storage.from_(bucket).create_signed_url(pdf_name, 3600)["signedURL"]
+            except Exception:
+                pdf_url = None
+
+            # Descargar el JSON y parsear contenido
+            data = _descargar_json(json_url)
+            if data is not None:
+                rows.append((*(data.get(k, "") for k in _CAMPOS_CABECERA), json_url, pdf_url))
+    df = pd.DataFrame.from_records(rows, columns=[*_CAMPOS_CABECERA, "json_url", "pdf_url"])
+    df = df.astype({k: "string[pyarrow]" for k in _CAMPOS_CABECERA})
+    if not df.empty:
+        df = df.sort_values(by="creado_en", ascending=False)
+    return _con_texto_busqueda(df)
+
 def listar_informes_supabase() -> pd.DataFrame:
     """Lista los informes almacenados en Supabase (archivos .json)."""
     try:
-        archivos = supabase.storage.from_(bucket).list("", limit=1000)
-        rows = []
-        for obj in archivos:
-            if obj["name"].endswith(".json"):
-                # URL firmada temporal para el JSON
-                json_url = supabase.storage.from_(bucket).create_signed_url(obj["name"], 3600)["signedURL"]
-
-                # Asumimos que el PDF está junto al JSON (mismo prefijo, distinta extensión)
-                pdf_name = obj["name"].replace(".json", ".pdf")
-                try:
-                    pdf_url = supabase.storage.from_(bucket).create_signed_url(pdf_name, 3600)["signedURL"]
-                except Exception:
-                    pdf_url = None
-
-                # Descargar el JSON y parsear contenido
-                import requests
-                resp = requests.get(json_url)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    rows.append({
-                        "identificador": data.get("identificador", ""),
-                        "modelo": data.get("modelo", ""),
-                        "cliente": data.get("cliente", ""),
-                        "fecha_inspeccion": data.get("fecha_inspeccion", ""),
-                        "fecha_fabricacion": data.get("fecha_fabricacion", ""),
-                        "documento": data.get("documento", ""),
-                        "creado_en": data.get("creado_en", ""),
-                        "json_url": json_url,
-                        "pdf_url": pdf_url,
-                    })
-        df = pd.DataFrame(rows)
-        if not df.empty:
-            df = df.sort_values(by="creado_en", ascending=False)
-        return df
+        return _leer_informes_supabase()
     except Exception as e:
         st.error(f"No se pudieron listar los informes de Supabase: {e}")
         return pd.DataFrame()
 
 def pagina_consultar():
-    st.header("Consultar informes (Supabase)")
+    if SUPABASE_ENABLED:
+        st.header("Consultar informes (Supabase)")
+        df = listar_informes_supabase()
+        if df.empty:
+            st.info("No hay informes aún en Supabase.")
+            return
+    else:
+        # Sin Supabase se listan los informes guardados en REPORTS_DIR
+        st.header("Consultar informes (local)")
+        df = cargar_informes(clave_informes())
+        if df.empty:
+            st.info(f"No hay informes aún en {REPORTS_DIR}.")
+            return
 
-    df = listar_informes_supabase()
-    if df.empty:
-        st.info("No hay informes aún en Supabase.")
-        return
+    _buscar_y_mostrar(df)
 
+@st.fragment
+def _buscar_y_mostrar(df: pd.DataFrame) -> None:
+    # Buscador, tabla y detalle se re-ejecutan sin volver a listar los informes
     buscador = st.text_input("Buscar por identificador/cliente/modelo")
     if buscador:
-        mask = (
-            df.identificador.str.contains(buscador, case=False, na=False) |
-            df.cliente.str.contains(buscador, case=False, na=False) |
-            df.modelo.str.contains(buscador, case=False, na=False)
-        )
-        df = df[mask]
+        df = df[_mascara_busqueda(df, buscador)]
 
     st.dataframe(
         df[["identificador", "cliente", "modelo", "fecha_inspeccion", "creado_en"]].reset_index(drop=True),
@@ -336,16 +562,30 @@ def pagina_consultar():
             st.write(f"Modelo: {fila.modelo}")
             st.write(f"Creado: {fila.creado_en}")
         with cb:
-            if fila.pdf_url:
+            if "pdf_url" not in df.columns:
+                pdf = Path(fila.pdf)
+                try:
+                    pdf_bytes = _leer_pdf_local(str(pdf), pdf.stat().st_mtime_ns)
+                except OSError:
+                    st.warning("No se encontró el PDF")
+                else:
+                    st.download_button("Descargar PDF", pdf_bytes, file_name=pdf.name, use_container_width=True)
+            elif fila.pdf_url:
                 st.link_button("Abrir PDF en Supabase", fila.pdf_url, use_container_width=True)
             else:
                 st.warning("No se encontró PDF en Supabase")
 
-        # Vista rápida del JSON
-        import requests
-        resp = requests.get(fila.json_url)
-        if resp.status_code == 200:
-            st.expander("Vista rápida del contenido").json(resp.json())
+        # Vista rápida del JSON (el de Supabase ya se descargó al listar)
+        if "json_url" in df.columns:
+            data = _descargar_json(fila.json_url)
+        else:
+            try:
+                data = _leer_json_local(str(fila.json), Path(fila.json).stat().st_mtime_ns)
+            except (OSError, orjson.JSONDecodeError):
+                data = None
+                st.warning("No se pudo leer el JSON del informe")
+        if data is not None:
+            st.expander("Vista rápida del contenido").json(data)
 
 def upload_file_to_supabase(local_path: Path, remote_path: str) -> str | None:
     if not SUPABASE_ENABLED or supabase is None: